@@ -1,29 +1,47 @@
 import os
-from fastapi import FastAPI, HTTPException, Request
-from pydantic import BaseModel
+import msgspec
+from fastapi import FastAPI, HTTPException, Response
 from opentelemetry import trace
 from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import OTLPSpanExporter
 from opentelemetry.instrumentation.fastapi import FastAPIInstrumentor
 from opentelemetry.sdk.resources import Resource
 from opentelemetry.sdk.trace import TracerProvider
 from opentelemetry.sdk.trace.export import BatchSpanProcessor
-from opentelemetry.propagate import extract
+from opentelemetry.sdk.trace.sampling import ParentBased, TraceIdRatioBased
 
 SERVICE_NAME = os.getenv("SERVICE_NAME", "product-service")
 OTEL_ENDPOINT = os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT", "http://localhost:4317")
+BSP_MAX_QUEUE_SIZE = int(os.getenv("OTEL_BSP_MAX_QUEUE_SIZE", "4096"))
+BSP_SCHEDULE_DELAY = int(os.getenv("OTEL_BSP_SCHEDULE_DELAY", "2000"))
+BSP_MAX_EXPORT_BATCH_SIZE = int(
+    os.getenv("OTEL_BSP_MAX_EXPORT_BATCH_SIZE", str(min(1024, BSP_MAX_QUEUE_SIZE)))
+)
+BSP_EXPORT_TIMEOUT = int(os.getenv("OTEL_BSP_EXPORT_TIMEOUT", "10000"))
+TRACES_SAMPLER_ARG = float(os.getenv("OTEL_TRACES_SAMPLER_ARG", "0.1"))
+OTEL_SDK_DISABLED = os.getenv("OTEL_SDK_DISABLED", "false").lower() == "true"
 
-resource = Resource.create({"service.name": SERVICE_NAME})
-trace.set_tracer_provider(TracerProvider(resource=resource))
-tracer = trace.get_tracer(__name__)
+if not OTEL_SDK_DISABLED:
+    resource = Resource.create({"service.name": SERVICE_NAME})
+    sampler = ParentBased(root=TraceIdRatioBased(TRACES_SAMPLER_ARG))
+    trace.set_tracer_provider(TracerProvider(resource=resource, sampler=sampler))
+
+    otlp_exporter = OTLPSpanExporter(endpoint=OTEL_ENDPOINT, insecure=True)
+    span_processor = BatchSpanProcessor(
+        otlp_exporter,
+        max_queue_size=BSP_MAX_QUEUE_SIZE,
+        schedule_delay_millis=BSP_SCHEDULE_DELAY,
+        max_export_batch_size=BSP_MAX_EXPORT_BATCH_SIZE,
+        export_timeout_millis=BSP_EXPORT_TIMEOUT,
+    )
+    trace.get_tracer_provider().add_span_processor(span_processor)
 
-otlp_exporter = OTLPSpanExporter(endpoint=OTEL_ENDPOINT, insecure=True)
-span_processor = BatchSpanProcessor(otlp_exporter)
-trace.get_tracer_provider().add_span_processor(span_processor)
+tracer = trace.get_tracer(__name__)
 
 app = FastAPI(title="Product Service")
-FastAPIInstrumentor.instrument_app(app)
+if not OTEL_SDK_DISABLED:
+    FastAPIInstrumentor.instrument_app(app, excluded_urls="/health$")
 
-class Product(BaseModel):
+class Product(msgspec.Struct, frozen=True):
     id: int
     name: str
     category: str
@@ -34,23 +52,24 @@ products_db = {
     2: Product(id=2, name="Wireless Headphones", category="electronics", price=199.99),
     3: Product(id=3, name="Programming Book", category="books", price=49.99),
 }
+products_list = list(products_db.values())
+products_json = msgspec.json.encode(products_list)
+product_ids = tuple(products_db)
 
 @app.get("/health")
-async def health_check():
+async def health_check() -> dict[str, str]:
     return {"status": "healthy", "service": SERVICE_NAME}
 
 @app.get("/products")
 async def get_products():
-    return list(products_db.values())
+    return Response(content=products_json, media_type="application/json")
 
 @app.get("/products/recommend")
-async def recommend_products(request: Request):
+async def recommend_products():
     with tracer.start_as_current_span("recommend_products") as span:
-        parent_context = extract(dict(request.headers))
-        
         # Simple recommendation for demostration, return all products
-        products = list(products_db.values())
-        return products
+        span.set_attribute("recommendation.product_ids", product_ids)
+        return Response(content=products_json, media_type="application/json")
 
 if __name__ == "__main__":
     import uvicorn
@@ -1,6 +1,8 @@
 import os
+from contextlib import asynccontextmanager
 import httpx
-from fastapi import FastAPI, HTTPException
+import orjson
+from fastapi import Depends, FastAPI, HTTPException, Request, Response
 from pydantic import BaseModel
 from opentelemetry import trace
 from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import OTLPSpanExporter
@@ -9,67 +11,110 @@ from opentelemetry.instrumentation.httpx import HTTPXClientInstrumentor
 from opentelemetry.sdk.resources import Resource
 from opentelemetry.sdk.trace import TracerProvider
 from opentelemetry.sdk.trace.export import BatchSpanProcessor
-from opentelemetry.propagate import inject
+from opentelemetry.sdk.trace.sampling import ParentBased, TraceIdRatioBased
 
 SERVICE_NAME = os.getenv("SERVICE_NAME", "user-service")
 OTEL_ENDPOINT = os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT", "http://localhost:4317")
+BSP_MAX_QUEUE_SIZE = int(os.getenv("OTEL_BSP_MAX_QUEUE_SIZE", "4096"))
+BSP_SCHEDULE_DELAY = int(os.getenv("OTEL_BSP_SCHEDULE_DELAY", "2000"))
+BSP_MAX_EXPORT_BATCH_SIZE = int(
+    os.getenv("OTEL_BSP_MAX_EXPORT_BATCH_SIZE", str(min(1024, BSP_MAX_QUEUE_SIZE)))
+)
+BSP_EXPORT_TIMEOUT = int(os.getenv("OTEL_BSP_EXPORT_TIMEOUT", "10000"))
+TRACES_SAMPLER_ARG = float(os.getenv("OTEL_TRACES_SAMPLER_ARG", "0.1"))
+OTEL_SDK_DISABLED = os.getenv("OTEL_SDK_DISABLED", "false").lower() == "true"
 PRODUCT_SERVICE_URL = os.getenv("PRODUCT_SERVICE_URL", "http://localhost:8000")
 
-resource = Resource.create({"service.name": SERVICE_NAME})
-trace.set_tracer_provider(TracerProvider(resource=resource))
-tracer = trace.get_tracer(__name__)
+if not OTEL_SDK_DISABLED:
+    resource = Resource.create({"service.name": SERVICE_NAME})
+    sampler = ParentBased(root=TraceIdRatioBased(TRACES_SAMPLER_ARG))
+    trace.set_tracer_provider(TracerProvider(resource=resource, sampler=sampler))
 
-otlp_exporter = OTLPSpanExporter(endpoint=OTEL_ENDPOINT, insecure=True)
-span_processor = BatchSpanProcessor(otlp_exporter)
-trace.get_tracer_provider().add_span_processor(span_processor)
+    otlp_exporter = OTLPSpanExporter(endpoint=OTEL_ENDPOINT, insecure=True)
+    span_processor = BatchSpanProcessor(
+        otlp_exporter,
+        max_queue_size=BSP_MAX_QUEUE_SIZE,
+        schedule_delay_millis=BSP_SCHEDULE_DELAY,
+        max_export_batch_size=BSP_MAX_EXPORT_BATCH_SIZE,
+        export_timeout_millis=BSP_EXPORT_TIMEOUT,
+    )
+    trace.get_tracer_provider().add_span_processor(span_processor)
 
-app = FastAPI(title="User Service")
-FastAPIInstrumentor.instrument_app(app)
-HTTPXClientInstrumentor().instrument()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    app.state.product_client = httpx.AsyncClient(
+        base_url=PRODUCT_SERVICE_URL,
+        timeout=httpx.Timeout(connect=1.0, read=5.0, write=2.0, pool=0.5),
+        limits=httpx.Limits(
+            max_keepalive_connections=50,
+            max_connections=100,
+            keepalive_expiry=30.0,
+        ),
+    )
+    yield
+    await app.state.product_client.aclose()
+
+def get_http_client(request: Request) -> httpx.AsyncClient:
+    return request.app.state.product_client
+
+app = FastAPI(title="User Service", lifespan=lifespan)
+if not OTEL_SDK_DISABLED:
+    FastAPIInstrumentor.instrument_app(app, excluded_urls="/health$")
+    HTTPXClientInstrumentor().instrument()
 
 class User(BaseModel):
     id: int
     name: str
     email: str
 
+class UserRecommendations(BaseModel):
+    user: User
+    products: list[dict]
+
 users_db = {
     1: User(id=1, name="John Doe", email="john@example.com"),
     2: User(id=2, name="Jane Smith", email="jane@example.com"),
 }
+health_json = orjson.dumps({"status": "healthy", "service": SERVICE_NAME})
+users_list = list(users_db.values())
+users_json = orjson.dumps([user.model_dump() for user in users_list])
+user_json_by_id = {
+    user_id: orjson.dumps(user.model_dump()) for user_id, user in users_db.items()
+}
 
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy", "service": SERVICE_NAME}
+    return Response(content=health_json, media_type="application/json")
 
 @app.get("/users")
 async def get_users():
-    return list(users_db.values())
+    return Response(content=users_json, media_type="application/json")
 
 @app.get("/users/{user_id}")
 async def get_user(user_id: int):
     if user_id not in users_db:
         raise HTTPException(status_code=404, detail="User not found")
-    return users_db[user_id]
+    return Response(content=user_json_by_id[user_id], media_type="application/json")
 
 @app.get("/users/{user_id}/recommendations")
-async def get_user_recommendations(user_id: int):
-    with tracer.start_as_current_span("get_user_recommendations") as span:
-        if user_id not in users_db:
-            raise HTTPException(status_code=404, detail="User not found")
-        
-        user = users_db[user_id]
-        
-        headers = {}
-        inject(headers)
-        
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"{PRODUCT_SERVICE_URL}/products/recommend",
-                headers=headers
-            )
-            products = response.json()
-        
-        return {"user": user, "products": products}
+async def get_user_recommendations(
+    user_id: int, http_client: httpx.AsyncClient = Depends(get_http_client)
+) -> UserRecommendations:
+    if user_id not in users_db:
+        raise HTTPException(status_code=404, detail="User not found")
+    
+    user = users_db[user_id]
+    trace.get_current_span().set_attribute("user.id", user_id)
+    
+    try:
+        response = await http_client.get("/products/recommend")
+    except httpx.TransportError:
+        raise HTTPException(status_code=503, detail="Product service unavailable") from None
+    if response.is_error:
+        raise HTTPException(status_code=502, detail="Product service error")
+    products = orjson.loads(response.content)
+    
+    return UserRecommendations(user=user, products=products)
 
 if __name__ == "__main__":
     import uvicorn